@@ -29,6 +29,23 @@ COLOR_PALETTE = [
 # which is used to reduce noise in images.
 MEDIAN_KERNEL_SIZE = 3
 
+# Median filter kernel shape.
+# 'disk' uses a disk (2D) or ball (3D) of radius MEDIAN_KERNEL_SIZE.
+# 'square' uses a square (2D) or cube (3D) window of side 2 * MEDIAN_KERNEL_SIZE + 1,
+# which allows 2D images to be filtered with OpenCV's much faster median blur.
+MEDIAN_KERNEL_SHAPE = 'disk'
+
+# Gaussian filter standard deviation.
+# Used instead of the median filter when an analysis sets "denoise_mode" to "gaussian",
+# which is much cheaper on large stacks since the Gaussian filter is separable.
+GAUSSIAN_SIGMA = 1.0
+
+# Background subtraction box size.
+# Used instead of the median filter when an analysis sets "denoise_mode" to "background":
+# the mean over a box of this size is subtracted from each pixel, which flattens uneven illumination
+# and is much cheaper than a median filter since the box filter is separable.
+BACKGROUND_BOX_SIZE = 50
+
 # Morphological opening kernel size.
 # Defines the size for the structuring element used in morphological opening,
 # which helps in removing small objects or details from an image.
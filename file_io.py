@@ -1,10 +1,38 @@
+import atexit
+import copy
 import json
-from tkinter import filedialog, Tk
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Fall back to the standard library json module
+
+# Parsed configuration files, keyed by path, along with the file modification time and size
+_config_cache = {}
+
+# Hidden Tk root window shared by all file dialogs
+_root = None
+
+def file_key(file_path):
+    """
+    Identify the current version of a file on disk.
+
+    Parameters:
+    file_path (str): Path to the file.
+
+    Returns:
+    tuple: Modification time (in nanoseconds) and size of the file.
+    """
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
 
 def load_config_from_json(json_file_path):
     """
     Load the entire configuration data from a JSON file.
 
+    Parsed files are cached, and only parsed again when their modification time or size changes.
+
     Parameters:
     json_file_path (str): Path to the JSON configuration file.
 
@@ -15,8 +43,21 @@ def load_config_from_json(json_file_path):
     FileNotFoundError: If the JSON file is not found.
     """
     try:
-        with open(json_file_path, 'r') as file:
-            config = json.load(file)
+        current_key = file_key(json_file_path)
+
+        cached = _config_cache.get(json_file_path)
+        if cached is not None and cached[0] == current_key:
+            return copy.deepcopy(cached[1])
+
+        if orjson is not None:
+            with open(json_file_path, 'rb') as file:
+                config = orjson.loads(file.read())
+        else:
+            with open(json_file_path, 'rb') as file:
+                config = json.loads(file.read())
+
+        # Callers are free to modify the returned dict, so keep a separate copy
+        _config_cache[json_file_path] = (current_key, copy.deepcopy(config))
         return config
     except FileNotFoundError:
         raise FileNotFoundError(f"JSON file not found: {json_file_path}")
@@ -25,6 +66,9 @@ def write_config_to_json(json_file_path, new_config):
     """
     Overwrite a JSON file with new configuration data.
 
+    The file is replaced atomically, so it is never left half-written. Nothing is written if the file
+    already holds the same configuration.
+
     Parameters:
     json_file_path (str): Path to the JSON configuration file.
     new_config (dict): Entire new configuration data to be written to the JSON file.
@@ -33,11 +77,68 @@ def write_config_to_json(json_file_path, new_config):
     FileNotFoundError: If the JSON file is not found.
     """
     try:
-        with open(json_file_path, 'w') as file:
-            json.dump(new_config, file, indent=4)
+        cached = _config_cache.get(json_file_path)
+        if cached is not None and os.path.exists(json_file_path) and cached[0] == file_key(json_file_path) and cached[1] == new_config:
+            return
+
+        # Serialize up front so the file is written in a single call. The standard library is used even
+        # if orjson is available, so that hand-edited files always keep the same 4-space indentation.
+        data = json.dumps(new_config, indent=4).encode('utf-8')
+
+        temporary_path = json_file_path + '.tmp'
+        with open(temporary_path, 'wb') as file:
+            file.write(data)
+        os.replace(temporary_path, json_file_path)
+
+        # Keep the cache in sync so the next load does not parse the file again
+        _config_cache[json_file_path] = (file_key(json_file_path), copy.deepcopy(new_config))
     except FileNotFoundError:
         raise FileNotFoundError(f"JSON file not found: {json_file_path}")
 
+class BufferedConfig:
+    """
+    Context manager that loads a JSON configuration file once and writes it back once on exit.
+
+    Changes to the configuration are made in memory, and the file is only rewritten if the
+    configuration differs from what was loaded. Changes are written even if the block raises,
+    so that intermediate results stored in the configuration are not lost.
+
+    Parameters:
+    json_file_path (str): Path to the JSON configuration file.
+    """
+    def __init__(self, json_file_path):
+        self.json_file_path = json_file_path
+        self.config = None
+        self.loaded_config = None
+
+    def __enter__(self):
+        self.config = load_config_from_json(self.json_file_path)
+        self.loaded_config = copy.deepcopy(self.config)
+        return self.config
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.config != self.loaded_config:
+            write_config_to_json(self.json_file_path, self.config)
+        return False
+
+def get_root():
+    """
+    Get the hidden Tk root window, creating it on first use.
+
+    The window is reused by every file dialog and destroyed when the program exits.
+
+    Returns:
+    Tk: The hidden Tk root window.
+    """
+    global _root
+    if _root is None:
+        from tkinter import Tk
+
+        _root = Tk()
+        _root.withdraw()  # Hide the main window
+        atexit.register(_root.destroy)
+    return _root
+
 def ask_for_file_path(title="Select file", filetypes=(("JSON files", "*.json"), ("All files", "*.*"))):
     """
     Open a file dialog for the user to select a file.
@@ -49,8 +150,6 @@ def ask_for_file_path(title="Select file", filetypes=(("JSON files", "*.json"),
     Returns:
     str: Path to the selected file, or None if operation is canceled.
     """
-    root = Tk()
-    root.withdraw()  # Hide the main window
-    file_path = filedialog.askopenfilename(title=title, filetypes=filetypes)
-    root.destroy()
-    return file_path
+    from tkinter import filedialog
+
+    return filedialog.askopenfilename(parent=get_root(), title=title, filetypes=filetypes)
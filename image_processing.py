@@ -1,48 +1,240 @@
+import hashlib
 import numpy as np
-from config import MEDIAN_KERNEL_SIZE, OPENING_KERNEL_SIZE, DILATION_KERNEL_SIZE
-from scipy.spatial import cKDTree
-from scipy.optimize import minimize
+import tifffile
+from numba import njit, prange
+from config import MEDIAN_KERNEL_SIZE, MEDIAN_KERNEL_SHAPE, GAUSSIAN_SIGMA, BACKGROUND_BOX_SIZE, OPENING_KERNEL_SIZE, DILATION_KERNEL_SIZE
+from scipy.ndimage import find_objects, gaussian_filter, uniform_filter, median_filter as ndimage_median_filter
+from scipy.spatial.distance import cdist
 from skimage import io
-from skimage.filters import median, threshold_otsu
-from skimage.measure import regionprops, label
-from skimage.morphology import disk, ball, opening, dilation
-from sklearn.metrics import mean_squared_error
+from skimage.filters import threshold_otsu
+from skimage.measure import label
+from skimage.morphology import disk, ball, opening
+
+# Binary kernels, keyed by size and dimension.
+_kernels = {}
+
+# Results of locate_blobs, keyed by image content and detection parameters.
+_blob_cache = {}
+
+# Fast lossless compression of the TIFF files written by this module.
+_TIFF_COMPRESSION = {'compression': 'zlib', 'compressionargs': {'level': 1}}
+
+def denoise(image, mode='median'):
+    """
+    Reduce noise in an image before blob detection.
+
+    Parameters:
+    image (ndarray): The input image.
+    mode (str): 'median' for a median filter, 'gaussian' for a Gaussian filter of standard deviation GAUSSIAN_SIGMA,
+        or 'background' for a subtraction of the local mean over a box of size BACKGROUND_BOX_SIZE.
+
+    Returns:
+    ndarray: The denoised image, with the same dtype as the input.
+
+    Raises:
+    ValueError: If the mode is unknown.
+    """
+    if mode == 'median':
+        return median_filter(image)
+    elif mode == 'gaussian':
+        return gaussian_filter(image, sigma=GAUSSIAN_SIGMA, mode='nearest')
+    elif mode == 'background':
+        return background_subtract(image, BACKGROUND_BOX_SIZE)
+    else:
+        raise ValueError(f"Unknown denoise mode: {mode}")
+
+def denoise_halo(mode='median'):
+    """
+    Get the number of neighboring pixels on each side that affect a denoised pixel.
+
+    Parameters:
+    mode (str): Denoising mode, as accepted by denoise.
+
+    Returns:
+    int: The filter radius.
+    """
+    if mode == 'gaussian':
+        return int(4 * GAUSSIAN_SIGMA + 0.5)  # scipy truncates the kernel at 4 standard deviations
+    if mode == 'background':
+        return BACKGROUND_BOX_SIZE // 2
+    return MEDIAN_KERNEL_SIZE
+
+def background_subtract(image, box=50):
+    """
+    Remove a smoothly varying background from an image by subtracting its local mean.
+
+    The local mean is computed with scipy's separable uniform filter. Pixels darker than their
+    background are clipped to 0, so the result can be stored in the input dtype.
+
+    Parameters:
+    image (ndarray): The input image.
+    box (int): Size of the box over which the background is averaged, along each axis.
+
+    Returns:
+    ndarray: The background-subtracted image, with the same dtype as the input.
+    """
+    image_float = image.astype(np.float32)
+    background_subtracted = image_float - uniform_filter(image_float, size=box, mode='nearest')
+    np.maximum(background_subtracted, 0, out=background_subtracted)
+
+    if np.issubdtype(image.dtype, np.integer):
+        np.rint(background_subtracted, out=background_subtracted)
+    return background_subtracted.astype(image.dtype, copy=False)
+
+def denoise_stack_to_file(stack, image_path, mode='median', intensity_range=None, block_depth=64):
+    """
+    Denoise a stack block by block along the first axis, writing each block to a TIFF file as soon as it is ready.
+
+    Blocks are extended by the filter radius on both sides, so the result matches denoising the whole stack at once,
+    and the source stack (typically memory-mapped) is never fully loaded in memory.
+
+    Parameters:
+    stack (ndarray): The input 3D stack.
+    image_path (str): The TIFF file path to save the denoised stack.
+    mode (str): Denoising mode, as accepted by denoise.
+    intensity_range (tuple, optional): Intensity range used to quantize each block to 8 bits. Required if the stack is not uint8.
+    block_depth (int): Number of planes denoised at once.
+
+    Returns:
+    ndarray: The denoised uint8 stack.
+    """
+    depth = stack.shape[0]
+    halo = denoise_halo(mode)
+    denoised_stack = np.empty(stack.shape, dtype=np.uint8)
+
+    def denoised_planes():
+        for start in range(0, depth, block_depth):
+            stop = min(start + block_depth, depth)
+            padded_start = max(start - halo, 0)
+            padded_stop = min(stop + halo, depth)
+
+            block = np.asarray(stack[padded_start:padded_stop])
+            if block.dtype != np.uint8:
+                block = to_uint8(block, *intensity_range)
+            denoised_stack[start:stop] = denoise(block, mode)[start - padded_start:stop - padded_start]
+
+            yield from denoised_stack[start:stop]
+
+    tifffile.imwrite(image_path, denoised_planes(), shape=stack.shape, dtype=np.uint8, **_TIFF_COMPRESSION)
+    return denoised_stack
 
 def median_filter(image):
     """
     Apply a median filter to an image.
 
+    The kernel shape is set by MEDIAN_KERNEL_SHAPE. Borders are handled by replicating edge pixels.
+
     Parameters:
     image (ndarray): The input image.
 
     Returns:
     ndarray: The filtered image.
     """
-    return median(image, binary_kernel(MEDIAN_KERNEL_SIZE, image.ndim))
+    if MEDIAN_KERNEL_SHAPE == 'square':
+        window_size = 2 * MEDIAN_KERNEL_SIZE + 1
+
+        # Imported here, since OpenCV is slow to import and only used with square kernels
+        try:
+            import cv2
+        except ImportError:
+            cv2 = None  # Fall back to scipy for all median filtering
+
+        # OpenCV supports any window size for uint8, but only up to 5 for uint16 and float32
+        if cv2 is not None and image.ndim == 2 and (
+            image.dtype == np.uint8 or (image.dtype in (np.uint16, np.float32) and window_size <= 5)
+        ):
+            return cv2.medianBlur(np.ascontiguousarray(image), window_size)
+
+        footprint = np.ones((window_size,) * image.ndim, dtype=bool)
+    else:
+        footprint = binary_kernel(MEDIAN_KERNEL_SIZE, image.ndim)
+
+    if image.dtype == np.uint8:
+        return median_filter_8bit(image, footprint)
+
+    return ndimage_median_filter(image, footprint=footprint, mode='nearest')
 
 def write_image(image_path, image):
     """
     Save an image to a specified path.
 
+    TIFF files are written with fast lossless (zlib level 1) compression.
+
     Parameters:
     image_path (str): The file path to save the image.
     image (ndarray): The image to be saved.
     """
-    io.imsave(image_path, image)
+    if image_path.lower().endswith(('.tif', '.tiff')):
+        tifffile.imwrite(image_path, image, **_TIFF_COMPRESSION)
+    else:
+        io.imsave(image_path, image)
 
-def read_image(image_path, dtype=None):
+def read_image(image_path, dtype=None, mmap=False):
     """
     Read an image from a specified path.
 
     Parameters:
     image_path (str): The file path of the image to read.
     dtype (data-type, optional): The desired data-type for the array. If None, the dtype of the loaded image is used.
+    mmap (bool): If True, memory-map the image instead of reading it, so that only the parts that are
+        accessed are loaded. Only uncompressed TIFF files can be memory-mapped; other files are read as usual.
 
     Returns:
     ndarray: The image as an array.
     """
+    if mmap and image_path.lower().endswith(('.tif', '.tiff')):
+        try:
+            image = tifffile.memmap(image_path, mode='r')
+        except ValueError:
+            pass  # Compressed or non-contiguous data
+        else:
+            if dtype is None or image.dtype == dtype:
+                return image
+            return image.astype(dtype)
+
     return np.asarray(io.imread(image_path), dtype=dtype)
 
+def to_uint8(image, vmin=None, vmax=None):
+    """
+    Quantize an image into 256 equal-width intensity bins.
+
+    Parameters:
+    image (ndarray): The input image.
+    vmin (float, optional): Lower edge of the first bin. If None, the image minimum is used.
+    vmax (float, optional): Upper edge of the last bin. If None, the image maximum is used.
+
+    Returns:
+    ndarray: The quantized uint8 image. Values outside [vmin, vmax] are clipped.
+    """
+    if image.dtype == np.uint8 and vmin is None and vmax is None:
+        return image
+
+    vmin = image.min() if vmin is None else vmin
+    vmax = image.max() if vmax is None else vmax
+    scale = 256 / (vmax - vmin) if vmax > vmin else 0
+
+    image_8bit = image.astype(np.float32)
+    image_8bit -= vmin
+    image_8bit *= scale
+    np.clip(image_8bit, 0, 255, out=image_8bit)
+    return image_8bit.astype(np.uint8)
+
+def threshold_otsu_8bit(image):
+    """
+    Compute Otsu's threshold of an 8-bit image from its histogram.
+
+    Parameters:
+    image (ndarray): The input uint8 image.
+
+    Returns:
+    int: The threshold value.
+    """
+    histogram = np.bincount(image.ravel(), minlength=256)
+    if np.count_nonzero(histogram) == 1:
+        return np.flatnonzero(histogram)[0]  # Constant image
+
+    return threshold_otsu(hist=(histogram, np.arange(256)))
+
 def add_z(points, z_spacing, z_size):
     """
     Add a Z-dimension to 2D points based on specified spacing and size.
@@ -59,17 +251,20 @@ def add_z(points, z_spacing, z_size):
     middle_index = int((z_size - 1) / 2)
     z_half_range = int((number_of_blobs - 1) / 2 * z_spacing)
 
-    indices = np.zeros(number_of_blobs, dtype=int)
+    indices = middle_index + z_half_range - np.arange(number_of_blobs, dtype=int) * z_spacing
 
-    for ii in range(number_of_blobs):
-        indices[ii] = middle_index + z_half_range - ii * z_spacing
+    points_3d = np.empty((number_of_blobs, points.shape[1] + 1), dtype=np.result_type(indices, points))
+    points_3d[:, 0] = indices
+    points_3d[:, 1:] = points
 
-    return np.hstack((indices.reshape(-1, 1), points))
+    return points_3d
 
 def binary_kernel(operator_size, dim=2):
     """
     Generate a binary kernel for morphological operations.
 
+    Kernels are cached and shared between calls, and are therefore read-only.
+
     Parameters:
     operator_size (int): The size of the kernel.
     dim (int): The dimension of the kernel (2D or 3D).
@@ -77,87 +272,306 @@ def binary_kernel(operator_size, dim=2):
     Returns:
     ndarray: The binary kernel.
     """
-    if dim == 2:
-        return disk(operator_size)
-    elif dim == 3:
-        return ball(operator_size)
-    else:
-        return None
+    key = (operator_size, dim)
+    if key not in _kernels:
+        if dim == 2:
+            kernel = disk(operator_size)
+        elif dim == 3:
+            kernel = ball(operator_size)
+        else:
+            return None
+        kernel.flags.writeable = False
+        _kernels[key] = kernel
+
+    return _kernels[key]
+
+# Build the kernels used by the pipeline once, at import
+for kernel_size in (MEDIAN_KERNEL_SIZE, OPENING_KERNEL_SIZE, DILATION_KERNEL_SIZE):
+    binary_kernel(kernel_size, dim=2)
+    binary_kernel(kernel_size, dim=3)
+
+def image_digest(image):
+    """
+    Compute a key identifying the content of an image.
 
-def get_largest_regions_by_area(labels, num_regions=1):
+    Parameters:
+    image (ndarray): The input image.
+
+    Returns:
+    tuple: Hash of the image data, along with its shape and dtype.
+    """
+    image = np.ascontiguousarray(image)
+    return hashlib.blake2b(image, digest_size=16).hexdigest(), image.shape, image.dtype.str
+
+def footprint_rows(footprint):
+    """
+    Decompose a symmetric 3D footprint into horizontal runs.
+
+    Parameters:
+    footprint (ndarray): A 3D footprint symmetric about its center, such as a ball.
+
+    Returns:
+    tuple: (Z, Y) offsets of each non-empty footprint row, and the half-width of its run.
+    """
+    center = np.array(footprint.shape) // 2
+    rows = np.argwhere(footprint.any(axis=2))
+    half_widths = footprint[rows[:, 0], rows[:, 1]].sum(axis=1) // 2
+    return (rows - center[:2]).astype(np.int64), half_widths.astype(np.int64)
+
+@njit(parallel=True, cache=True)
+def _threshold_and_dilate(image, threshold, row_offsets, row_half_widths):
+    depth, height, width = image.shape
+
+    # Running count of above-threshold pixels along each row
+    counts = np.zeros((depth, height, width + 1), dtype=np.int32)
+    for z in prange(depth):
+        for y in range(height):
+            for x in range(width):
+                counts[z, y, x + 1] = counts[z, y, x] + (image[z, y, x] > threshold)
+
+    # A pixel is set if any footprint row centered on it covers an above-threshold pixel
+    binary_image = np.zeros(image.shape, dtype=np.bool_)
+    for z in prange(depth):
+        for y in range(height):
+            for ii in range(row_offsets.shape[0]):
+                source_z = z + row_offsets[ii, 0]
+                source_y = y + row_offsets[ii, 1]
+                if source_z < 0 or source_z >= depth or source_y < 0 or source_y >= height:
+                    continue
+                if counts[source_z, source_y, width] == 0:
+                    continue
+
+                half_width = row_half_widths[ii]
+                for x in range(width):
+                    start = max(x - half_width, 0)
+                    stop = min(x + half_width + 1, width)
+                    if counts[source_z, source_y, stop] > counts[source_z, source_y, start]:
+                        binary_image[z, y, x] = True
+
+    return binary_image
+
+def threshold_and_dilate(image, threshold, footprint):
     """
-    Extract the largest regions by area from a labeled image.
+    Threshold an image and dilate the resulting binary image in a single compiled pass.
+
+    Parameters:
+    image (ndarray): The input image (2D or 3D).
+    threshold (float): Pixels strictly above this value are foreground.
+    footprint (ndarray): Symmetric structuring element of the dilation, with the same dimension as the image.
+
+    Returns:
+    ndarray: The dilated binary image.
+    """
+    if image.ndim == 2:
+        return threshold_and_dilate(image[np.newaxis], threshold, footprint[np.newaxis])[0]
+
+    row_offsets, row_half_widths = footprint_rows(footprint)
+    return _threshold_and_dilate(np.ascontiguousarray(image), threshold, row_offsets, row_half_widths)
+
+@njit(parallel=True, cache=True)
+def _median_filter_8bit(image, row_offsets, row_half_widths, rank):
+    depth, height, width = image.shape
+    filtered_image = np.empty_like(image)
+
+    for z in prange(depth):
+        histogram = np.zeros(256, dtype=np.int32)
+        for y in range(height):
+            # Histogram of the window centered on the first pixel of the row, with edge pixels replicated
+            histogram[:] = 0
+            for ii in range(row_offsets.shape[0]):
+                source_z = min(max(z + row_offsets[ii, 0], 0), depth - 1)
+                source_y = min(max(y + row_offsets[ii, 1], 0), height - 1)
+                for x in range(-row_half_widths[ii], row_half_widths[ii] + 1):
+                    histogram[image[source_z, source_y, min(max(x, 0), width - 1)]] += 1
+
+            # The median is the value whose bin contains the given rank, and below counts the values under it
+            median = 0
+            below = 0
+            while below + histogram[median] <= rank:
+                below += histogram[median]
+                median += 1
+            filtered_image[z, y, 0] = median
+
+            # Slide the window along the row, updating only the pixels entering and leaving each footprint row
+            for x in range(1, width):
+                for ii in range(row_offsets.shape[0]):
+                    source_z = min(max(z + row_offsets[ii, 0], 0), depth - 1)
+                    source_y = min(max(y + row_offsets[ii, 1], 0), height - 1)
+                    half_width = row_half_widths[ii]
+
+                    leaving = image[source_z, source_y, max(x - half_width - 1, 0)]
+                    histogram[leaving] -= 1
+                    if leaving < median:
+                        below -= 1
+
+                    entering = image[source_z, source_y, min(x + half_width, width - 1)]
+                    histogram[entering] += 1
+                    if entering < median:
+                        below += 1
+
+                while below > rank:
+                    median -= 1
+                    below -= histogram[median]
+                while below + histogram[median] <= rank:
+                    below += histogram[median]
+                    median += 1
+                filtered_image[z, y, x] = median
+
+    return filtered_image
+
+def median_filter_8bit(image, footprint):
+    """
+    Apply a median filter to an 8-bit image using a sliding histogram.
+
+    The histogram is updated incrementally as the footprint slides along each row, so the cost per pixel
+    grows with the number of footprint rows rather than the number of footprint pixels. Borders are handled
+    by replicating edge pixels, and the output matches scipy's median_filter in 'nearest' mode.
+
+    Parameters:
+    image (ndarray): The input uint8 image (2D or 3D).
+    footprint (ndarray): Symmetric footprint of the filter, with the same dimension as the image.
+
+    Returns:
+    ndarray: The filtered image.
+    """
+    if image.ndim == 2:
+        return median_filter_8bit(image[np.newaxis], footprint[np.newaxis])[0]
+
+    row_offsets, row_half_widths = footprint_rows(footprint)
+    rank = np.count_nonzero(footprint) // 2
+    return _median_filter_8bit(np.ascontiguousarray(image), row_offsets, row_half_widths, rank)
+
+def get_largest_labels_by_area(labels, num_regions=1):
+    """
+    Find the labels of the largest regions by area in a labeled image.
 
     Parameters:
     labels (ndarray): A labeled image, typically from image segmentation.
-    num_regions (int): Number of largest regions to extract.
+    num_regions (int): Number of largest regions to find.
 
     Returns:
-    list: Region properties of the largest areas.
+    ndarray: Labels of the largest regions, sorted by decreasing area.
     """
-    regions = regionprops(labels)
-    sorted_regions = sorted(regions, key=lambda x: x.area, reverse=True)
-    return sorted_regions[:num_regions]
+    areas = np.bincount(labels.ravel())
+    areas[0] = 0  # Ignore the background
+    num_regions = min(num_regions, np.count_nonzero(areas))
+    if num_regions == 0:
+        return np.empty(0, dtype=int)
+
+    # A stable sort keeps ties in label order, including at the cutoff
+    return np.argsort(-areas, kind='stable')[:num_regions]
 
-def locate_blobs(image, number_of_blobs, source=1):
+def measure_regions(labels, region_labels):
+    """
+    Compute the centroid and major axis length of selected regions in a labeled image.
+
+    The major axis length matches the definition used by skimage's regionprops, and is derived
+    from the largest eigenvalue of each region's coordinate covariance.
+
+    Parameters:
+    labels (ndarray): A labeled image, typically from image segmentation.
+    region_labels (ndarray): Labels of the regions to measure.
+
+    Returns:
+    tuple: Centroids of the regions and their major axis lengths.
+    """
+    # Length of the ellipse (2D) or ellipsoid (3D) major axis with the same second moments
+    axis_factor = 16 if labels.ndim == 2 else 20
+
+    slices = find_objects(labels, max_label=max(region_labels, default=0))
+    centroids = np.zeros((len(region_labels), labels.ndim))
+    major_axis_lengths = np.zeros(len(region_labels))
+
+    for ii, region_label in enumerate(region_labels):
+        region_slice = slices[region_label - 1]
+        coordinates = np.nonzero(labels[region_slice] == region_label)
+        coordinates = np.stack(coordinates, axis=1) + [dim_slice.start for dim_slice in region_slice]
+
+        centroids[ii] = coordinates.mean(axis=0)
+        covariance = np.atleast_2d(np.cov(coordinates, rowvar=False, bias=True))
+        major_axis_lengths[ii] = np.sqrt(axis_factor * max(np.linalg.eigvalsh(covariance)[-1], 0))
+
+    return centroids, major_axis_lengths
+
+def locate_blobs(image, number_of_blobs, source=1, debug=False):
     """
     Locate significant blobs in an image using morphological operations.
 
+    The image is quantized to 8 bits before thresholding. Results for 2D images are memoized on the image
+    content, so repeated calls on the same image return immediately. 3D stacks are not memoized, since
+    hashing a whole stack costs more than the cache could save.
+
     Parameters:
     image (ndarray): The input image.
     number_of_blobs (int): Number of blobs to identify.
     source (int): Determines the morphological operation (0 for dilation, otherwise opening).
+    debug (bool): If True, display the binary image in Napari before labeling.
 
     Returns:
     tuple: Centroids of identified blobs and average major axis length.
     """
-    threshold = threshold_otsu(image)
+    cache_key = (image_digest(image), number_of_blobs, source) if image.ndim == 2 else None
+    if not debug and cache_key in _blob_cache:
+        centroids, avg_major_axis_length = _blob_cache[cache_key]
+        return centroids.copy(), avg_major_axis_length
+
+    # Thresholding only needs 8 bits, which also quarters the memory traffic of the morphology
+    image_8bit = to_uint8(image)
+
+    threshold = threshold_otsu_8bit(image_8bit)
     #if image.ndim == 3:
     #    threshold += 50
-    binary_image = image > threshold
 
     if source == 0:
-        binary_image = dilation(binary_image, binary_kernel(DILATION_KERNEL_SIZE, dim=image.ndim))
+        binary_image = threshold_and_dilate(image_8bit, threshold, binary_kernel(DILATION_KERNEL_SIZE, dim=image.ndim))
     else:
+        binary_image = image_8bit > threshold
         #binary_image = opening(binary_image, binary_kernel(OPENING_KERNEL_SIZE, dim=image.ndim))
         pass
-    
-    import napari
-    napari.view_image(binary_image)
-    napari.run()
+
+    if debug:
+        import napari
+        napari.view_image(binary_image)
+        napari.run()
 
     labels = label(binary_image)
-    regions = get_largest_regions_by_area(labels, number_of_blobs)
+    largest_labels = get_largest_labels_by_area(labels, number_of_blobs)
+
+    centroids, major_axis_lengths = measure_regions(labels, largest_labels)
+    avg_major_axis_length = np.mean(major_axis_lengths)
 
-    centroids = np.array([region.centroid for region in regions])
-    avg_major_axis_length = np.mean([region.major_axis_length for region in regions])
-            
+    if cache_key is not None:
+        _blob_cache[cache_key] = (centroids.copy(), avg_major_axis_length)
     return centroids, avg_major_axis_length
 
 def find_closest_regions(napari_points, auto_points):
     """
     Match points from a user interface to the closest automatically located points.
 
+    Each user-selected point is assigned a distinct automatically located point such that
+    the total distance over all pairs is minimal (linear sum assignment).
+
     Parameters:
     napari_points (ndarray): Coordinates selected by the user.
     auto_points (ndarray): Automatically located coordinates.
 
     Returns:
     ndarray: Coordinates of the closest automatically located points to the user-selected points.
+
+    Raises:
+    ValueError: If there are fewer automatically located points than user-selected points.
     """
-    used_indices = set()
-    ordered_points = []
+    from scipy.optimize import linear_sum_assignment
 
-    for point in napari_points:
-        available_points = np.array([pt for ii, pt in enumerate(auto_points) if ii not in used_indices])
-        tree = cKDTree(available_points)
-        _, closest_idx = tree.query(point)
-        closest_global_idx = [ii for ii in range(len(auto_points)) if ii not in used_indices][closest_idx]
+    auto_points = np.asarray(auto_points)
+    if len(napari_points) > len(auto_points):
+        raise ValueError(f"Cannot match {len(napari_points)} points to only {len(auto_points)} located blobs")
 
-        ordered_points.append(auto_points[closest_global_idx])
-        used_indices.add(closest_global_idx)
+    # With at least as many columns as rows, every row is assigned and the columns follow the row order
+    distances = cdist(napari_points, auto_points)
+    _, closest_indices = linear_sum_assignment(distances)
 
-    return np.array(ordered_points)
+    return auto_points[closest_indices]
 
 def create_rotation_matrix(angle):
     """
@@ -177,22 +591,6 @@ def create_rotation_matrix(angle):
     rotation_matrix = np.array([[c, -s], [s, c]])
     return rotation_matrix
 
-def calculate_rmse_after_rotation(angle, reference_coordinates, coordinates_to_be_rotated):
-    """
-    Calculate the root mean square error (RMSE) after rotating a set of coordinates.
-
-    Parameters:
-    angle (float): Rotation angle in radians.
-    reference_coordinates (ndarray): Reference coordinates.
-    coordinates_to_be_rotated (ndarray): Coordinates to be rotated.
-
-    Returns:
-    float: RMSE between the reference and rotated coordinates.
-    """
-    rotation_matrix = create_rotation_matrix(angle)
-    rotated_coordinates = np.dot(coordinates_to_be_rotated, rotation_matrix.T)
-    return mean_squared_error(reference_coordinates, rotated_coordinates)
-
 def find_transform(points_1, points_2):
     """
     Determine the transformation parameters (translation, scaling, rotation) between two sets of points.
@@ -216,13 +614,32 @@ def find_transform(points_1, points_2):
     scaling_factor = norm_2 / norm_1
     scaled_1 = centered_points_1 * scaling_factor
 
-    result = minimize(calculate_rmse_after_rotation, 0, args=(scaled_1, centered_points_2), method="L-BFGS-B")
-    if not result.success:
-        raise ValueError("Optimization failed: " + result.message)
+    # Closed-form least-squares rotation of the second set onto the first (Kabsch algorithm)
+    covariance = centered_points_2.T @ scaled_1
+    u, _, vt = np.linalg.svd(covariance)
+    reflection = np.sign(np.linalg.det(vt.T @ u.T))
+    rotation_matrix = vt.T @ np.diag([1, reflection]) @ u.T
 
-    angle = result.x[0]
+    angle = np.arctan2(rotation_matrix[1, 0], rotation_matrix[0, 0])
     return center_of_mass_1, center_of_mass_2, scaling_factor, angle
 
+def mapping_affine(center_1, center_2, scaling_factor, angle):
+    """
+    Combine transformation parameters (translation, scaling, rotation) into a single affine transformation.
+
+    Parameters:
+    center_1 (ndarray): Center of mass of the first set of points.
+    center_2 (ndarray): Center of mass of the second set of points.
+    scaling_factor (float): Scaling factor.
+    angle (float): Rotation angle.
+
+    Returns:
+    tuple: Linear part and offset of the transformation, to be applied as points @ matrix + offset.
+    """
+    matrix = scaling_factor * create_rotation_matrix(-angle).T
+    offset = np.asarray(center_2) - np.asarray(center_1) @ matrix
+    return matrix, offset
+
 def transform_coordinates(points_1, center_1, center_2, scaling_factor, angle):
     """
     Apply transformation (translation, scaling, rotation) to a set of coordinates.
@@ -237,10 +654,9 @@ def transform_coordinates(points_1, center_1, center_2, scaling_factor, angle):
     Returns:
     ndarray: Transformed coordinates.
     """
-    coordinates_centered = points_1 - center_1
-    coordinates_scaled = coordinates_centered * scaling_factor
-    rotation_matrix = create_rotation_matrix(-angle)
-    coordinates_rotated = np.dot(coordinates_scaled, rotation_matrix.T)
-    coordinates_transformed = coordinates_rotated + center_2
+    matrix, offset = mapping_affine(center_1, center_2, scaling_factor, angle)
+
+    coordinates_transformed = np.asarray(points_1) @ matrix
+    coordinates_transformed += offset
 
     return coordinates_transformed
\ No newline at end of file
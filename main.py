@@ -1,8 +1,14 @@
+import os
 import numpy as np
-from file_io import ask_for_file_path, load_config_from_json, write_config_to_json
-from image_processing import add_z, find_closest_regions, find_transform, locate_blobs, median_filter, read_image, transform_coordinates, write_image
+from config import MEDIAN_KERNEL_SIZE, MEDIAN_KERNEL_SHAPE, GAUSSIAN_SIGMA, BACKGROUND_BOX_SIZE
+from file_io import BufferedConfig, ask_for_file_path, file_key, load_config_from_json, write_config_to_json
+from image_processing import add_z, denoise, denoise_stack_to_file, find_closest_regions, find_transform, locate_blobs, read_image, transform_coordinates
 from visualization import display_image_napari, plot_accuracy
 
+# How stacks are quantized to 8 bits before denoising; change it whenever the quantization changes,
+# so that stacks denoised the old way are computed again
+STACK_QUANTIZATION = "uint8_p1_max"
+
 def map(config_file_path):
     """
     Perform image mapping based on configuration from a JSON file.
@@ -82,80 +88,128 @@ def update_mapping_configuration(config, center_1, center_2, scaling, angle):
     config["mapping"]["parameters"]["angle"] = angle
     config["mapping"]["settings"]["mapped"] = True
 
+def load_denoised_stack(config):
+    """
+    Load the denoised stack, computing it and caching it on disk if needed.
+
+    The stack is contrast-stretched to 8 bits before denoising, between its 1st percentile and its maximum,
+    and the intensity range used is stored in the configuration. The cached stack is only reused if the
+    source stack, the denoising mode and parameters, and the quantization are unchanged. If the source
+    stack is missing, the cached stack is reused as is. For compatibility, its path is stored under
+    "stack_median" whatever the mode.
+
+    Parameters:
+    config (dict): Configuration dictionary, updated with the path of the cached stack.
+
+    Returns:
+    ndarray: The denoised uint8 stack.
+    """
+    denoise_mode = config["analysis"]["settings"].get("denoise_mode", "median")
+    stack_path = config["analysis"]["paths"]["stack"]
+    denoised_path = config["analysis"]["paths"].get("stack_median")
+
+    if os.path.exists(stack_path):
+        denoise_settings = (denoise_mode, MEDIAN_KERNEL_SHAPE, MEDIAN_KERNEL_SIZE, GAUSSIAN_SIGMA, BACKGROUND_BOX_SIZE, STACK_QUANTIZATION)
+        stack_key = "_".join(str(value) for value in file_key(stack_path) + denoise_settings)
+        cache_valid = config["analysis"]["paths"].get("stack_median_key") == stack_key
+    else:
+        # The source stack was moved or deleted, so the cached stack cannot be checked, nor computed again
+        stack_key = None
+        cache_valid = True
+
+    if denoised_path is not None and cache_valid and os.path.exists(denoised_path):
+        return read_image(denoised_path, dtype=np.uint8)
+
+    stack = read_image(stack_path, dtype=config["mapping"]["settings"]["bit_depth_2"], mmap=True)
+    intensity_range = None
+    if stack.dtype != np.uint8:
+        # Blob detection is threshold-based, so 8 bits are enough and halve the data moved by the filter.
+        # Blobs are sparse, so an upper percentile could fall in the background: keep the true maximum.
+        intensity_range = [float(np.percentile(stack[::2, ::4, ::4], 1)), float(stack.max())]
+        config["analysis"]["results"]["stack_intensity_range"] = intensity_range
+
+    # Stream the stack through the filter to disk, without holding the source stack in memory
+    denoised_path = stack_path[:-4] + f"_{denoise_mode}.tif"
+    stack = denoise_stack_to_file(stack, denoised_path, denoise_mode, intensity_range)
+    config["analysis"]["paths"]["stack_median"] = denoised_path
+    config["analysis"]["paths"]["stack_median_key"] = stack_key
+
+    return stack
+
 def analyze_stack(config_file_path):
-    # Load the mapping parameters from the selected JSON file
-    try:
-        config = load_config_from_json(config_file_path)
-        analysis_settings = config["analysis"]["settings"]
+    """
+    Locate blobs in a stack and compare them to the mapped reference blobs.
 
-        center_1 = config["mapping"]["parameters"]["center_1"]
-        center_2 = config["mapping"]["parameters"]["center_2"]
-        scaling = config["mapping"]["parameters"]["scaling"]
-        angle = config["mapping"]["parameters"]["angle"]
+    Parameters:
+    config_file_path (str): Path to the JSON configuration file.
 
-        blob_z_spacing = config["analysis"]["settings"]["blob_z_spacing"]
+    Returns:
+    tuple: Stack, mapped reference blobs, detected stack blobs, blob size and voxel size.
+    """
+    # Load the mapping parameters from the selected JSON file; changes are written back once on exit
+    with BufferedConfig(config_file_path) as config:
+        try:
+            analysis_settings = config["analysis"]["settings"]
 
-        stack_blob_count = config["analysis"]["settings"]["blob_count"]
+            # Check if analysis is already done, before reading any image
+            if not analysis_settings.get("analyzed", False):
+                print("Analysis data not available. Analyzing now...")
+            else:
+                print("Analysis data available. Skipping analysis.")
+                stack = load_denoised_stack(config)
+                return stack, np.asarray(config['analysis']['results']['ref_blob_map']), np.asarray(config['analysis']['results']['stack_blobs']), config['analysis']['results']['blob_size'], config['analysis']['settings']['voxel_size_um']
 
-        ref_path = config["analysis"]["paths"]["ref_img"]
+            center_1 = config["mapping"]["parameters"]["center_1"]
+            center_2 = config["mapping"]["parameters"]["center_2"]
+            scaling = config["mapping"]["parameters"]["scaling"]
+            angle = config["mapping"]["parameters"]["angle"]
 
-        ref_image = read_image(ref_path, dtype=config["mapping"]["settings"]["bit_depth_1"])
-        ref_image = median_filter(ref_image)
-        voxel_size = config["analysis"]["settings"]["voxel_size_um"]
+            blob_z_spacing = config["analysis"]["settings"]["blob_z_spacing"]
 
-        if "stack_median" in config["analysis"]["paths"]:
-            stack_path = config["analysis"]["paths"]["stack_median"]
-            stack = read_image(stack_path, dtype=config["mapping"]["settings"]["bit_depth_2"])
-        else:
-            stack_path = config["analysis"]["paths"]["stack"]
-            stack = read_image(stack_path, dtype=config["mapping"]["settings"]["bit_depth_2"])
-            stack = median_filter(stack)
-            stack_path = stack_path[:-4] + "_median.tif"
-            write_image(stack_path, stack)
-            config["analysis"]["paths"]["stack_median"] = stack_path
-            write_config_to_json(config_file_path, config)
-            
-        if not analysis_settings.get("analyzed", False):
-            print("Analysis data not available. Analyzing now...")
-        else:
-            print("Analysis data available. Skipping analysis.")
-            return stack, np.asarray(config['analysis']['results']['ref_blob_map']), np.asarray(config['analysis']['results']['stack_blobs']), config['analysis']['results']['blob_size'], config['analysis']['settings']['voxel_size_um']
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return
-    
-    # Automatically locate the blobs in the the reference image
-    auto_blob, blob_size = locate_blobs(ref_image, stack_blob_count)
+            stack_blob_count = config["analysis"]["settings"]["blob_count"]
 
-    # Let user select blobs in the reference image
-    napari_blob = display_image_napari(ref_image, stack_blob_count, blob_size, title='Identify Blobs In Reference Image')
+            ref_path = config["analysis"]["paths"]["ref_img"]
 
-    # Match and order automatically located blobs to user-selected blobs
-    ref_blob = find_closest_regions(napari_blob, auto_blob)
+            ref_image = read_image(ref_path, dtype=config["mapping"]["settings"]["bit_depth_1"])
+            ref_image = denoise(ref_image, analysis_settings.get("denoise_mode", "median"))
+            voxel_size = config["analysis"]["settings"]["voxel_size_um"]
 
-    # Map reference blob coordinates
-    ref_blob_map = transform_coordinates(ref_blob, center_1, center_2, scaling, angle)
+            stack = load_denoised_stack(config)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return
 
-    # Augment mapped blobs with z coordinates
-    ref_blob_map = add_z(ref_blob_map, blob_z_spacing, stack.shape[0])
+        # Automatically locate the blobs in the the reference image
+        auto_blob, blob_size = locate_blobs(ref_image, stack_blob_count)
 
-    # Automatically locate the blobs in the stack
-    stack_blobs, _ = locate_blobs(stack, stack_blob_count)
-  
-    # Order located blobs
-    stack_blobs = find_closest_regions(ref_blob_map, stack_blobs)
+        # Let user select blobs in the reference image
+        napari_blob = display_image_napari(ref_image, stack_blob_count, blob_size, title='Identify Blobs In Reference Image')
 
-    try:
-        config['analysis']['settings']['analyzed'] = True
-        config['analysis']['results']['ref_blob_map'] = ref_blob_map.tolist()
-        config['analysis']['results']['stack_blobs'] = stack_blobs.tolist()
-        config['analysis']['results']['blob_size'] = blob_size
-        write_config_to_json(config_file_path, config)
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return
+        # Match and order automatically located blobs to user-selected blobs
+        ref_blob = find_closest_regions(napari_blob, auto_blob)
+
+        # Map reference blob coordinates
+        ref_blob_map = transform_coordinates(ref_blob, center_1, center_2, scaling, angle)
+
+        # Augment mapped blobs with z coordinates
+        ref_blob_map = add_z(ref_blob_map, blob_z_spacing, stack.shape[0])
+
+        # Automatically locate the blobs in the stack
+        stack_blobs, _ = locate_blobs(stack, stack_blob_count)
+
+        # Order located blobs
+        stack_blobs = find_closest_regions(ref_blob_map, stack_blobs)
+
+        try:
+            config['analysis']['settings']['analyzed'] = True
+            config['analysis']['results']['ref_blob_map'] = ref_blob_map.tolist()
+            config['analysis']['results']['stack_blobs'] = stack_blobs.tolist()
+            config['analysis']['results']['blob_size'] = blob_size
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return
 
-    return stack, ref_blob_map, stack_blobs, blob_size, voxel_size
+        return stack, ref_blob_map, stack_blobs, blob_size, voxel_size
 
 def main():
     """
@@ -1,10 +1,30 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import napari
 from config import CMAP, COLOR_PALETTE
 
 plt.style.use('dark_background')
 
+# Palette as an array, so that colors for any number of points can be cycled with np.resize
+PALETTE_COLORS = np.array(COLOR_PALETTE)
+
+# Text annotation parameters of the points layers, by image dimension
+TEXT_PARAMETERS = {
+    2: {
+        'text': 'S{number}',
+        'size': 10,
+        'color': 'white',
+        'anchor': 'upper_left',
+        'translation': [-10, 0]  # Adjust text offset if needed
+    },
+    3: {
+        'text': 'S{number}',
+        'size': 10,
+        'color': 'white',
+        'anchor': 'upper_left',
+        'translation': [-4, -10, -10]  # Adjust text offset if needed
+    },
+}
+
 def visualize_image(image, title='Image Viewer'):
     plt.figure()
     plt.imshow(image, cmap=CMAP)
@@ -20,37 +40,39 @@ def plot_accuracy(target_positions, actual_positions, voxel_size=[1, 1, 1]):
     actual_positions (ndarray): Array of actual positions.
     voxel_size (list): Voxel size in each dimension.
     """
-    # Generate labels for each point
-    labels = [f'S{ii + 1}' for ii in range(target_positions.shape[0])]
+    # Generate labels for each point, shown as tick labels on a numeric axis
+    point_count = target_positions.shape[0]
+    positions = np.arange(point_count)
+    labels = [f'S{ii + 1}' for ii in range(point_count)]
 
-    # Define accuracy in each dimension
-    accuracies = [
-        (target_positions[:, 1] - actual_positions[:, 1]) * voxel_size[1],  # X Accuracy
-        (target_positions[:, 2] - actual_positions[:, 2]) * voxel_size[2],  # Y Accuracy
-        (target_positions[:, 0] - actual_positions[:, 0]) * voxel_size[0]   # Z Accuracy
-    ]
+    # Define accuracy in each dimension, with columns reordered from (Z, X, Y) to (X, Y, Z)
+    accuracies = ((np.asarray(target_positions) - np.asarray(actual_positions)) * np.asarray(voxel_size))[:, [1, 2, 0]]
 
-    # Plotting accuracies in each dimension
-    for i, accuracy in enumerate(accuracies, start=1):
-        plot_dimension_accuracy(i, labels, accuracy, f'{["X", "Y", "Z"][i-1]} Accuracy')
+    # Plotting accuracies in each dimension, side by side in a single figure
+    colors = np.resize(PALETTE_COLORS, point_count)
+    _, axes = plt.subplots(1, 3, figsize=(12, 4))
+    for ax, axis_name, accuracy in zip(axes, ('X', 'Y', 'Z'), accuracies.T):
+        plot_dimension_accuracy(ax, positions, labels, accuracy, f'{axis_name} Accuracy', colors)
 
     plt.show()
 
-def plot_dimension_accuracy(subplot_index, labels, accuracy, title):
+def plot_dimension_accuracy(ax, positions, labels, accuracy, title, colors):
     """
     Helper function to plot accuracy in one dimension.
 
     Parameters:
-    subplot_index (int): Index of the subplot.
+    ax (Axes): Axes to plot on.
+    positions (ndarray): X position of each data point.
     labels (list): Labels for each data point.
     accuracy (ndarray): Accuracy values for the dimension.
     title (str): Title of the subplot.
+    colors (ndarray): Color of each data point.
     """
-    c = [COLOR_PALETTE[i % len(COLOR_PALETTE)] for i in range(len(labels))]
-    plt.subplot(1, 4, subplot_index)
-    plt.title(title)
-    plt.scatter(labels, accuracy, c=c)
-    plt.grid()
+    ax.set_title(title)
+    ax.scatter(positions, accuracy, c=colors)
+    ax.set_xticks(positions)
+    ax.set_xticklabels(labels)
+    ax.grid()
 
 def display_image_napari(image, points_count, points_size, title='Napari Image Viewer', colormap=CMAP, scale=[1, 1, 1], custom_points=None, auto_points=None):
     """
@@ -69,6 +91,8 @@ def display_image_napari(image, points_count, points_size, title='Napari Image V
     Returns:
     Viewer: The Napari viewer instance.
     """
+    import napari
+
     viewer = napari.Viewer(title=title)
 
     if image.ndim == 3:
@@ -79,26 +103,11 @@ def display_image_napari(image, points_count, points_size, title='Napari Image V
         scale = [1, 1]
 
     # Assign colors from the palette to each point's edge
-    point_colors = [COLOR_PALETTE[i % len(COLOR_PALETTE)] for i in range(points_count)]
+    point_colors = np.resize(PALETTE_COLORS, points_count)
 
     # Set the properties for the points including the text
-    properties = {'number': [str(i+1) for i in range(points_count)]}  # Starting at 1
-    if image.ndim == 2:
-        text_parameters = {
-            'text': 'S{number}',
-            'size': 10,
-            'color': 'white',
-            'anchor': 'upper_left',
-            'translation': [-10, 0]  # Adjust text offset if needed
-        }
-    elif image.ndim == 3:
-        text_parameters = {
-            'text': 'S{number}',
-            'size': 10,
-            'color': 'white',
-            'anchor': 'upper_left',
-            'translation': [-4, -10, -10]  # Adjust text offset if needed
-        }        
+    properties = {'number': np.arange(1, points_count + 1).astype(str)}  # Starting at 1
+    text_parameters = TEXT_PARAMETERS[image.ndim]
 
     # If custom points are provided, use them; otherwise, generate points around the center
     if custom_points is not None:
@@ -121,12 +130,9 @@ def display_image_napari(image, points_count, points_size, title='Napari Image V
         center_y, center_x = np.array(image.shape[:2]) / 2
 
         # Generate points in a circular pattern around the center
-        angle_step = 2 * np.pi / points_count
+        angles = np.arange(points_count) * (2 * np.pi / points_count)
         radius = min(center_x, center_y) / 4  # Adjust the radius as necessary
-        points = np.array([
-            (center_y + radius * np.sin(i * angle_step), center_x + radius * np.cos(i * angle_step))
-            for i in range(points_count)
-        ])
+        points = np.stack([center_y + radius * np.sin(angles), center_x + radius * np.cos(angles)], axis=1)
 
         # Add a points layer with the generated points
         points_layer = viewer.add_points(points, size=points_size, edge_width=0.05,